@@ -26,6 +26,16 @@ AVAILABLE_COLORS = [
 HEAD_YAW_LEFT = -15   # Most left position
 HEAD_YAW_RIGHT = 15   # Most right position
 
+# Pose each action opens with, so it can be set up while Dash is idle
+OPENING_POSES = {
+    "think": {
+        "eye": 0,
+        "lights": "black",
+        "head_yaw": HEAD_YAW_LEFT,
+        "head_pitch": 0,
+    },
+}
+
 # Thinking sounds - using confused noises
 THINKING_SOUNDS = [
     "confused2",
@@ -87,18 +97,84 @@ def turn(robot, angle, speed=200, movement_stack=None):
             stack.DashMovement(stack.MovementType.TURN, angle)
         )
 
-def think(robot):
+def prepare(robot, action, cancelled=None):
+    """Move the robot into the opening pose of an action ahead of time.
+    
+    :param robot: The MorseRobot instance
+    :param action: Name of the action to prepare for (a key of OPENING_POSES)
+    :param cancelled: Optional threading.Event; preparation stops as soon as it is set
+    :return: True if the full pose was reached, False if cancelled
+    """
+    pose = OPENING_POSES[action]
+    # One field at a time so a cancellation takes effect between commands
+    steps = [
+        {"eye": pose["eye"]},
+        {"lights": pose["lights"]},
+        {"head_yaw": pose["head_yaw"], "head_pitch": pose["head_pitch"]},
+    ]
+    for step in steps:
+        if cancelled is not None and cancelled.is_set():
+            return False
+        set_frame(robot, **step)
+    return True
+
+def _pause(cancelled, seconds):
+    """Sleep for `seconds`, returning early if the `cancelled` event is set."""
+    if cancelled is None:
+        time.sleep(seconds)
+    else:
+        cancelled.wait(seconds)
+
+def think(robot, prepared=False, variant="full", cancelled=None):
     """Function that makes an eye movement to simulate thinking.
     
     The robot looks in 4 different positions while the LEDs progressively light up.
     Head yaw limits: HEAD_YAW_LEFT to HEAD_YAW_RIGHT (left to right)
     Head pitch limits: -5 to 10 (down to up)
+    
+    :param robot: The MorseRobot instance
+    :param prepared: If True, the robot is already in OPENING_POSES["think"]
+                     (see prepare) and the setup is skipped
+    :param variant: "full", "short" or "minimal" (see variants.ACTION_DURATIONS)
+    :param cancelled: Optional threading.Event; when set, the animation is cut
+                      short (even mid-pause) and the robot goes straight to the
+                      end position
     """
     # Play a random thinking noise at the start
-    turn_off_lights(robot)
+    if not prepared:
+        turn_off_lights(robot)
+
+    if variant == "minimal":
+        # Light every LED at once and look across without the walk
+        set_frame(robot, eye=0b111111111111, head_yaw=HEAD_YAW_RIGHT)
+        robot.say(random.choice(THINKING_SOUNDS))
+        time.sleep(.3)
+    elif variant == "short":
+        # Two LEDs per step, one look left and one look right, no walk
+        led_mask = 0
+        for i in range(0, 12, 2):
+            if cancelled is not None and cancelled.is_set():
+                break
+            led_mask |= (0b11 << i)
+            robot.eye(led_mask)
+            if i % 6 == 0:
+                yaw_angle = HEAD_YAW_LEFT if i == 0 else HEAD_YAW_RIGHT
+                robot.head_yaw(yaw_angle)
+                robot.say(random.choice(THINKING_SOUNDS))
+            _pause(cancelled, .4)
+
+    if variant != "full":
+        # Same end position as the full variant
+        robot.move(-6, 50, True)
+        robot.turn(3, 50)
+        robot.eye(0)
+        return
 
     led_mask = 0
+    moved = 0  # Distance walked so far, undone if the animation is cut short
     for i in range(0, 12, 1):
+        if cancelled is not None and cancelled.is_set():
+            break
         led_mask |= (1 << i)
         robot.eye(led_mask)
         
@@ -107,76 +183,117 @@ def think(robot):
             yaw_angle = HEAD_YAW_LEFT + (head_position_index / 3.0) * (HEAD_YAW_RIGHT - HEAD_YAW_LEFT)
             robot.head_yaw(int(yaw_angle))
             robot.say(random.choice(THINKING_SOUNDS))
-            time.sleep(0.5)
+            _pause(cancelled, 0.5)
         
         elif i == 4:
             robot.move(20, 50, True)
-            time.sleep(0.9)
+            moved += 20
+            _pause(cancelled, 0.9)
 
         elif i == 10:
             robot.move(-20, 50, True)
-            time.sleep(0.9)
+            moved -= 20
+            _pause(cancelled, 0.9)
 
         elif i in [3, 9]:
             robot.head_pitch(5)
-            time.sleep(0.3)
+            _pause(cancelled, 0.3)
             robot.head_pitch(-2)
-            time.sleep(0.3)
+            _pause(cancelled, 0.3)
 
         else:
-            time.sleep(.6)
+            _pause(cancelled, .6)
     
-    robot.move(-6, 50, True)
+    robot.move(-6 - moved, 50, True)
     robot.turn(3, 50)
     # Turn off all LEDs at the end
     robot.eye(0)
     # Return head to neutral position
 
-def found_answer(robot, color):
+def found_answer(robot, color, variant="full", on_reveal=None):
     """Function that makes the robot react happily when finding an answer.
     
+    The 180 degree turn happens in every variant, since celebrate and
+    feel_sad turn back from it.
+    
     :param robot: The MorseRobot instance
     :param color: Color of the answer (6-digit e.g. #fa3b2c, 3-digit e.g. #fbb, 
                   or fully spelled color e.g. white)
+    :param variant: "full", "short" or "minimal" (see variants.ACTION_DURATIONS)
+    :param on_reveal: Optional callable, called as soon as the answer color is showing
     """
     sounds = ["systwhistle_a", "systwhistle_b", "bragging"]
     # Light up all LEDs with the answer color
     all_leds = 0b111111111111  # All 12 LEDs lit (8191 in decimal)
     robot.eye(all_leds)
     turn_all_lights(robot, color)
+    if on_reveal is not None:
+        on_reveal()
     robot.say(random.choice(sounds), volume=0.5)
     robot.turn(180, 150)
+    if variant == "minimal":
+        return
+
     turn_all_lights(robot, color)
+    if variant == "short":
+        # Single quick nod
+        set_frame(robot, head_pitch=-5)
+        time.sleep(.3)
+        set_frame(robot, head_pitch=10)
+        return
     time.sleep(.6)
 
     turn_off_lights(robot)
     # Nod head up and down (happy nodding)
-    robot.head_pitch(-5)
-    turn_all_lights(robot, color)
+    set_frame(robot, eye=0b111111111111, lights=color, head_pitch=-5)
     time.sleep(.5)
-    robot.head_pitch(10)
+    set_frame(robot, eye=0b111111111111, lights=color, head_pitch=10)
 
-    turn_all_lights(robot, color)
 
+def set_frame(robot, eye=None, lights=None, head_yaw=None, head_pitch=None,
+              neck=None, left_ear=None, right_ear=None):
+    """Bring the eye, lights and head to a target state in one visual frame.
+    
+    Fields left as None are not changed. When the robot is a
+    RateLimitedTransport, fields already at the target value are not resent.
+    
+    :param robot: The MorseRobot instance (or RateLimitedTransport)
+    :param eye: Eye LED mask (0 = off, 0b111111111111 = all 12 lit)
+    :param lights: Color for the neck and both ears
+    :param head_yaw: Head yaw angle
+    :param head_pitch: Head pitch angle
+    :param neck: Neck color, overriding `lights`
+    :param left_ear: Left ear color, overriding `lights`
+    :param right_ear: Right ear color, overriding `lights`
+    """
+    frame = {
+        "eye": eye,
+        "neck_color": neck if neck is not None else lights,
+        "left_ear_color": left_ear if left_ear is not None else lights,
+        "right_ear_color": right_ear if right_ear is not None else lights,
+        "head_yaw": head_yaw,
+        "head_pitch": head_pitch,
+    }
+    if hasattr(robot, "set_frame"):
+        robot.set_frame(**frame)
+        return
+    for name in ("eye", "neck_color", "left_ear_color", "right_ear_color", "head_yaw", "head_pitch"):
+        if frame[name] is not None:
+            getattr(robot, name)(frame[name])
 
 def turn_all_lights(robot, color):
     """Set all lights on the robot to the specified color."""
-    robot.eye(0b111111111111)  # All 12 LEDs lit
-    robot.neck_color(color)
-    robot.left_ear_color(color)
-    robot.right_ear_color(color)
+    set_frame(robot, eye=0b111111111111, lights=color)  # All 12 LEDs lit
 
 def turn_off_lights(robot):
     """Turn off all lights on the robot."""
-    robot.eye(0)
-    robot.neck_color("black")
-    robot.left_ear_color("black")
-    robot.right_ear_color("black")
+    set_frame(robot, eye=0, lights="black")
 
-def celebrate(robot):
+def celebrate(robot, variant="full"):
     """Function that makes the robot celebrate with movements and sounds.
     
     :param robot: The MorseRobot instance
+    :param variant: "full", "short" or "minimal" (see variants.ACTION_DURATIONS)
     """
     sounds = ["systexcited_01", "systexcited_02", "systexcited_06", "systfantastic"]
     
@@ -190,6 +307,20 @@ def celebrate(robot):
     TURN_SPEED = 200
     TIME = 0.2
     
+    if variant != "full":
+        turn_all_lights(robot, "green")
+        robot.say(random.choice(sounds), volume=0.5)
+        if variant == "short":
+            # One head bob instead of two spins
+            set_frame(robot, head_yaw=LEFT, head_pitch=DOWN)
+            time.sleep(TIME)
+            set_frame(robot, head_yaw=RIGHT, head_pitch=UP)
+            time.sleep(TIME)
+            set_frame(robot, head_pitch=DOWN)
+        robot.turn(-176, 150)
+        turn_off_lights(robot)
+        return
+    
     for i in range(2):        
         # Alternate spinning direction
         turn_all_lights(robot, "green")
@@ -198,29 +329,25 @@ def celebrate(robot):
             robot.turn(TURN, TURN_SPEED)
         else:
             robot.turn(-TURN, TURN_SPEED)
-        turn_off_lights(robot)
         
         # Head movement sequence
-        robot.head_yaw(LEFT)
-        robot.head_pitch(DOWN)
+        set_frame(robot, eye=0, lights="black", head_yaw=LEFT, head_pitch=DOWN)
         time.sleep(TIME)
         
-        turn_all_lights(robot, "green")
-        robot.head_yaw(RIGHT)
-        robot.head_pitch(UP)
+        set_frame(robot, eye=0b111111111111, lights="green", head_yaw=RIGHT, head_pitch=UP)
         time.sleep(TIME)
         
-        robot.head_yaw(RIGHT)
-        robot.head_pitch(DOWN)
+        set_frame(robot, head_yaw=RIGHT, head_pitch=DOWN)
         time.sleep(TIME)
         turn_off_lights(robot)
     
     robot.turn(-176, 150)
 
-def feel_sad(robot):
+def feel_sad(robot, variant="full"):
     """Function that makes the robot express sadness with head movements and sounds.
     
     :param robot: The MorseRobot instance
+    :param variant: "full", "short" or "minimal" (see variants.ACTION_DURATIONS)
     """
     sounds = [
         "systawww_04",
@@ -230,22 +357,32 @@ def feel_sad(robot):
         "systoops_03",
     ]
     
-    turn_all_lights(robot, "red")
+    if variant != "full":
+        set_frame(robot, eye=0b111111111111, lights="red", head_pitch=-5)
+        robot.say(random.choice(sounds), volume=0.5)
+        if variant == "short":
+            # One head shake
+            robot.head_yaw(-15)
+            time.sleep(0.3)
+            robot.head_yaw(15)
+            time.sleep(0.3)
+        robot.turn(-183, 150)
+        turn_off_lights(robot)
+        return
+
     # Reset to looking up position
-    robot.head_pitch(5)
+    set_frame(robot, eye=0b111111111111, lights="red", head_pitch=5)
     robot.say(random.choice(sounds), volume=0.5)
     turn_off_lights(robot)
     time.sleep(.2)
     
     # Shake head "no" (left to right)
-    turn_all_lights(robot, "red")
-    robot.head_yaw(-15)
+    set_frame(robot, eye=0b111111111111, lights="red", head_yaw=-15)
     time.sleep(0.3)
     robot.head_yaw(15)
     time.sleep(0.3)
-    turn_off_lights(robot)
     # Look down (sad posture)
-    robot.head_pitch(-5)
+    set_frame(robot, eye=0, lights="black", head_pitch=-5)
     time.sleep(1)
     robot.say(random.choice(sounds), volume=0.5)
     turn_off_lights(robot)
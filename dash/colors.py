@@ -0,0 +1,120 @@
+"""
+Color resolution for Dash's lights.
+
+Maps the color names and hex codes sent by the web client to calibrated RGB
+values once, caching the result, so the light commands sent to the robot match
+the wires shown on screen.
+"""
+from __future__ import division, print_function
+
+try:
+    string_types = basestring  # Python 2: JSON strings arrive as unicode
+except NameError:
+    string_types = str
+
+# CSS color values for the names the web client and actions use
+NAMED_COLORS = {
+    "black": (0, 0, 0),
+    "white": (255, 255, 255),
+    "red": (255, 0, 0),
+    "green": (0, 128, 0),
+    "lime": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "cyan": (0, 255, 255),
+    "purple": (128, 0, 128),
+    "fuchsia": (255, 0, 255),
+    "magenta": (255, 0, 255),
+    "orange": (255, 165, 0),
+    "darkorange": (255, 140, 0),
+    "yellow": (255, 255, 0),
+    "pink": (255, 192, 203),
+}
+
+# Dash's LEDs wash out some hues, so on-screen colors are substituted with ones
+# that look alike on the robot (see AVAILABLE_COLORS in actions.py)
+DEFAULT_CALIBRATION = {
+    "purple": "fuchsia",     # roxo
+    "orange": "darkorange",  # wire color sent by rounds.json
+    "yellow": "darkorange",  # amarelo
+}
+
+
+def parse_color(color):
+    """
+    Parse a color into an (r, g, b) tuple of ints in 0-255.
+
+    :param color: Color name (e.g., "red"), 6-digit hex (e.g., "#fa3b2c"),
+                  3-digit hex (e.g., "#fbb") or an (r, g, b) tuple
+    :raises ValueError: If the color cannot be parsed
+    """
+    if isinstance(color, (tuple, list)):
+        if len(color) != 3:
+            raise ValueError("Expected an (r, g, b) tuple, got {0!r}".format(color))
+        return tuple(max(0, min(255, int(c))) for c in color)
+
+    value = str(color).strip().lower()
+    if value in NAMED_COLORS:
+        return NAMED_COLORS[value]
+
+    digits = value[1:] if value.startswith("#") else value
+    if len(digits) == 3:
+        digits = "".join(c * 2 for c in digits)
+    if len(digits) == 6:
+        try:
+            return tuple(int(digits[i:i + 2], 16) for i in (0, 2, 4))
+        except ValueError:
+            pass
+    raise ValueError("Unknown color: {0!r}".format(color))
+
+
+def to_hex(rgb):
+    """Format an (r, g, b) tuple as a "#rrggbb" string."""
+    return "#{0:02x}{1:02x}{2:02x}".format(*rgb)
+
+
+class ColorResolver:
+    """
+    Resolves colors to calibrated "#rrggbb" strings for a single robot.
+
+    Results are memoized, so each distinct color is parsed and calibrated
+    only once per robot.
+    """
+
+    def __init__(self, calibration=None, gains=(1.0, 1.0, 1.0)):
+        """
+        :param calibration: Dict mapping a color name or hex code to the color
+                            the robot should show instead (default DEFAULT_CALIBRATION)
+        :param gains: Per-channel (r, g, b) multipliers applied after substitution
+        """
+        if calibration is None:
+            calibration = DEFAULT_CALIBRATION
+        self.calibration = dict((str(k).strip().lower(), v)
+                                for k, v in calibration.items())
+        self.gains = tuple(gains)
+        self._cache = {}
+
+    def resolve(self, color):
+        """
+        Return the calibrated "#rrggbb" string for a color.
+
+        :param color: Anything accepted by parse_color
+        :raises ValueError: If the color cannot be parsed
+        """
+        key = color if isinstance(color, string_types) else tuple(color)
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        if isinstance(color, string_types):
+            color = self.calibration.get(color.strip().lower(), color)
+        rgb = parse_color(color)
+        rgb = tuple(max(0, min(255, int(round(c * g))))
+                    for c, g in zip(rgb, self.gains))
+        resolved = to_hex(rgb)
+        self._cache[key] = resolved
+        return resolved
+
+    def clear_cache(self):
+        """Forget resolved colors, e.g. after changing the calibration."""
+        self._cache.clear()
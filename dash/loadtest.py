@@ -0,0 +1,299 @@
+"""
+Load generator for the Flask robot server (server.py).
+
+Simulates N concurrent participants that follow the same round flow as
+web/src/main.js against a simulated robot, then reports throughput,
+latency percentiles, lock wait times and the server's thread count.
+
+Usage:
+    python loadtest.py --participants 4 --rounds 3 --time-scale 0.1
+"""
+from __future__ import division, print_function
+
+import argparse
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+try:
+    from urllib.request import Request, urlopen
+except ImportError:
+    from urllib2 import Request, urlopen
+
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import server
+import timing
+import variants
+
+# Round colors as they appear in web/public/config/rounds.json
+ROUND_COLORS = ["red", "green", "blue", "white", "purple", "orange"]
+
+# Approximate real duration (seconds) of connect(); actions use variants.ACTION_DURATIONS
+CONNECT_DURATION = 1.0
+
+# Client-side timings from web/src/main.js (seconds)
+ROUND_DURATION = 40.0     # bombCounter: participants may cut a wire any time in 40 s
+REVEAL_TARGET = 12.0      # callDash('think', {target}) starts Dash's reveal with the LLM message
+POLL_INTERVAL = 0.2       # waitForDashFound polls every 200 ms
+POLL_TIMEOUT = 15.0       # ...for at most 15 s
+POST_WAIT = 0.5           # extra wait after Dash reports completion
+COUNTDOWN = 10.0          # result overlay countdown before the next round
+
+
+class SimulatedRobot:
+    """Stands in for DashRobot, sleeping for the duration of each action."""
+
+    def __init__(self, time_scale=1.0):
+        self.time_scale = time_scale
+
+    def _act(self, name, variant="full"):
+        # variants.ACTION_DURATIONS is already scaled by instrument_server()
+        time.sleep(variants.duration(name, variant))
+
+    def connect(self): time.sleep(CONNECT_DURATION * self.time_scale)
+    def think(self, variant="full"): self._act('think', variant)
+    def find_answer(self, color, variant="full", on_reveal=None):
+        if on_reveal: on_reveal()  # the color shows with the first commands
+        self._act('found_answer', variant)
+    def celebrate(self, variant="full"): self._act('celebrate', variant)
+    def feel_sad(self, variant="full"): self._act('feel_sad', variant)
+
+
+class TimedLock(object):
+    """Drop-in replacement for threading.Lock that records acquire wait times."""
+
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.waits = []
+
+    def acquire(self, blocking=True):
+        start = time.time()
+        acquired = self._lock.acquire(blocking)
+        if acquired:
+            with self._stats_lock:
+                self.waits.append(time.time() - start)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class Stats:
+    """Thread-safe collector of per-endpoint latencies and status codes."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.peak_threads = server_thread_count()
+
+    def record(self, endpoint, latency, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(latency)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def sample_threads(self):
+        count = server_thread_count()
+        with self.lock:
+            self.peak_threads = max(self.peak_threads, count)
+        return count
+
+
+def server_thread_count():
+    """Threads other than the simulated participants and the harness's own thread."""
+    harness = threading.current_thread()
+    return sum(1 for t in threading.enumerate()
+               if t is not harness and not isinstance(t, Participant))
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = int(round(pct / 100.0 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+class Participant(threading.Thread):
+    """One simulated browser tab playing through the rounds of the study."""
+
+    def __init__(self, index, base_url, rounds, time_scale, stats):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.participant_id = 'load{0}'.format(index)
+        self.base_url = base_url
+        self.rounds = rounds
+        self.time_scale = time_scale
+        self.stats = stats
+
+    def _sleep(self, seconds):
+        time.sleep(seconds * self.time_scale)
+
+    def _call(self, method, endpoint, body=None):
+        url = '{0}/{1}'.format(self.base_url, endpoint)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        req = Request(url, data=data, headers={'Content-Type': 'application/json'})
+        req.get_method = lambda: method
+        name = endpoint.split('?')[0]
+        start = time.time()
+        try:
+            resp = urlopen(req, timeout=30)
+            payload = json.loads(resp.read().decode('utf-8'))
+            ok = True
+        except Exception:
+            payload = None
+            ok = False
+        self.stats.record(name, time.time() - start, ok)
+        return payload
+
+    def _wait_for_dash_found(self):
+        start = time.time()
+        while True:
+            state = self._call('GET', 'suggest/status')
+            if state:
+                think_done = state['think'].get('status') == 'done'
+                suggest_done = state['suggest'].get('status') == 'done'
+                if think_done and suggest_done:
+                    return True
+            if time.time() - start >= POLL_TIMEOUT * self.time_scale:
+                return False
+            self._sleep(POLL_INTERVAL)
+
+    def run(self):
+        for round_index in range(self.rounds):
+            color = random.choice(ROUND_COLORS)
+            round_start = time.time()
+            # The client asks for the reveal REVEAL_TARGET seconds in, then sends
+            # the color as soon as /think answers
+            self._call('POST', 'think', {'target': REVEAL_TARGET * self.time_scale})
+            self._call('POST', 'suggest', {'color': color})
+            # Participant cuts a wire at any point of the round, before or
+            # after the reveal, then polls until Dash is done (onClick)
+            cut_at = round_start + random.uniform(0, ROUND_DURATION) * self.time_scale
+            time.sleep(max(0, cut_at - time.time()))
+            self._wait_for_dash_found()
+            self._sleep(POST_WAIT)
+            outcome = random.choice(['win', 'loss'])
+            self._call('POST', 'celebrate' if outcome == 'win' else 'sad')
+            self._call('POST', 'csv', {
+                'participantId': self.participant_id,
+                'roundId': round_index + 1,
+                'roundIndex': round_index + 2,
+                'condition': 'loadtest',
+                'outcome': outcome,
+                'timeTaken': round((time.time() - round_start) / self.time_scale, 3),
+                'dashSuggestion': color,
+            })
+            self._sleep(COUNTDOWN)
+
+
+def instrument_server(time_scale):
+    """Swap the server's robot and locks for simulated/instrumented versions."""
+    server.robot = SimulatedRobot(time_scale)
+    # Scale the expected durations the server plans with, and keep the
+    # simulated runs away from the real robot's learned timings
+    for durations in variants.ACTION_DURATIONS.values():
+        for variant in durations:
+            durations[variant] *= time_scale
+    server.timing_model = timing.DurationModel('loadtest')
+    locks = {}
+    # robot_lock is left out: it is only taken while connecting, and the
+    # simulated robot is already in place
+    for name in ('think_lock', 'suggest_lock', 'csv_lock'):
+        locks[name] = TimedLock(name)
+        setattr(server, name, locks[name])
+    return locks
+
+
+def report(stats, locks, elapsed):
+    total = sum(len(v) for v in stats.latencies.values())
+    print('')
+    print('Requests: {0} in {1:.2f}s ({2:.1f} req/s)'.format(
+        total, elapsed, total / elapsed if elapsed else 0))
+    print('')
+    print('{0:<16}{1:>7}{2:>7}{3:>10}{4:>10}{5:>10}{6:>10}'.format(
+        'endpoint', 'count', 'errors', 'p50 ms', 'p90 ms', 'p99 ms', 'max ms'))
+    for endpoint in sorted(stats.latencies):
+        values = stats.latencies[endpoint]
+        print('{0:<16}{1:>7}{2:>7}{3:>10.1f}{4:>10.1f}{5:>10.1f}{6:>10.1f}'.format(
+            endpoint, len(values), stats.errors.get(endpoint, 0),
+            percentile(values, 50) * 1000, percentile(values, 90) * 1000,
+            percentile(values, 99) * 1000, max(values) * 1000))
+    print('')
+    print('{0:<16}{1:>9}{2:>12}{3:>10}{4:>10}'.format(
+        'lock', 'acquires', 'total ms', 'p99 ms', 'max ms'))
+    for name in sorted(locks):
+        waits = locks[name].waits
+        print('{0:<16}{1:>9}{2:>12.2f}{3:>10.3f}{4:>10.3f}'.format(
+            name, len(waits), sum(waits) * 1000,
+            percentile(waits, 99) * 1000, max(waits or [0]) * 1000))
+    print('')
+    print('Peak server threads: {0}, server threads at end: {1}'.format(
+        stats.peak_threads, server_thread_count()))
+
+
+def run(participants, rounds, time_scale, port):
+    """Run the load test and print a report."""
+    workdir = tempfile.mkdtemp(prefix='dash-loadtest-')
+    cwd = os.getcwd()
+    os.chdir(workdir)  # save_csv writes <participantId>.csv to the working directory
+
+    locks = instrument_server(time_scale)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    httpd = make_server('127.0.0.1', port, server.app, threaded=True)
+    server_thread = threading.Thread(target=httpd.serve_forever)
+    server_thread.daemon = True
+    server_thread.start()
+    base_url = 'http://127.0.0.1:{0}'.format(httpd.server_port)
+
+    stats = Stats()
+    clients = [Participant(i, base_url, rounds, time_scale, stats)
+               for i in range(participants)]
+    print('Running {0} participants x {1} rounds against {2} (time scale {3})'.format(
+        participants, rounds, base_url, time_scale))
+
+    start = time.time()
+    for client in clients:
+        client.start()
+    while any(client.is_alive() for client in clients):
+        stats.sample_threads()
+        time.sleep(0.05)
+    elapsed = time.time() - start
+
+    httpd.shutdown()
+    os.chdir(cwd)
+    shutil.rmtree(workdir, ignore_errors=True)
+    report(stats, locks, elapsed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the Dash Flask server.')
+    parser.add_argument('--participants', type=int, default=4,
+                        help='Number of concurrent simulated participants')
+    parser.add_argument('--rounds', type=int, default=3,
+                        help='Rounds played by each participant')
+    parser.add_argument('--time-scale', type=float, default=0.1,
+                        help='Multiplier applied to every real-world delay (1.0 = real time)')
+    parser.add_argument('--port', type=int, default=0,
+                        help='Port to bind the server to (0 = pick a free one)')
+    args = parser.parse_args()
+    run(args.participants, args.rounds, args.time_scale, args.port)
@@ -0,0 +1,176 @@
+"""
+ProgressIndex: a small per-participant summary kept next to each <participantId>.csv.
+
+Every time a round is saved, the index is rewritten atomically with the last
+completed roundIndex, outcome counts and the byte offset of the last CSV row,
+so the server can tell a restarted session where to resume without re-reading
+the whole CSV.
+"""
+from __future__ import division, print_function
+
+import csv
+import json
+import os
+import threading
+import time
+
+
+class ProgressIndex:
+    """
+    Per-participant progress, cached in memory and persisted to <participantId>.progress.json.
+
+    Usage:
+        index = ProgressIndex()
+        index.record("42", row, offset)   # after appending a row to 42.csv
+        index.get("42")                   # {"lastRoundIndex": 5, "nextRoundIndex": 6, ...}
+    """
+
+    def __init__(self, directory="."):
+        """
+        :param directory: Directory holding the participants' CSV and index files
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def csv_path(self, participant_id):
+        return os.path.join(self.directory, "{0}.csv".format(participant_id))
+
+    def index_path(self, participant_id):
+        return os.path.join(self.directory, "{0}.progress.json".format(participant_id))
+
+    def get(self, participant_id):
+        """
+        Return the progress of a participant, or None if nothing was saved for them.
+
+        Served from memory, then from the index file. The CSV is only scanned
+        if it has no index yet, or if the index points past the end of it
+        (e.g. the CSV was replaced).
+        """
+        with self._lock:
+            progress = self._current(participant_id)
+            if progress is None:
+                self._cache.pop(participant_id, None)
+                return None
+            self._cache[participant_id] = progress
+            return dict(progress, outcomes=dict(progress["outcomes"]))
+
+    def record(self, participant_id, row, offset):
+        """
+        Update a participant's progress after a row was appended to their CSV.
+
+        :param participant_id: Participant the row belongs to
+        :param row: The dict written to the CSV
+        :param offset: Byte offset in the CSV where the row starts
+        """
+        with self._lock:
+            # A rebuild already includes the row that was just appended
+            progress = self._current(participant_id) or self._empty(participant_id)
+            if progress["lastRowOffset"] is None or progress["lastRowOffset"] < offset:
+                self._apply(progress, row, offset)
+                self._save(participant_id, progress)
+            self._cache[participant_id] = progress
+
+    def reset(self, participant_id):
+        """
+        Start a participant's progress over, e.g. when their CSV was just created.
+        Whatever was counted for an earlier CSV with the same name is dropped.
+        """
+        with self._lock:
+            progress = self._empty(participant_id)
+            self._save(participant_id, progress)
+            self._cache[participant_id] = progress
+
+    # --- Internals ----------------------------------------------------------
+
+    def _current(self, participant_id):
+        """Cached or saved progress, rebuilt if it does not match the CSV on disk."""
+        path = self.csv_path(participant_id)
+        if not os.path.isfile(path):
+            return None
+        progress = self._cache.get(participant_id) or self._load(participant_id)
+        if progress is None:
+            # CSV written before indexes existed
+            return self._rebuild(participant_id)
+        last_offset = progress["lastRowOffset"]
+        if last_offset is not None and last_offset >= os.path.getsize(path):
+            # Index ahead of the file: the CSV was replaced or truncated
+            return self._rebuild(participant_id)
+        return progress
+
+    @staticmethod
+    def _empty(participant_id):
+        return {
+            "participantId": participant_id,
+            "lastRoundIndex": None,
+            "nextRoundIndex": 0,
+            "rows": 0,
+            "outcomes": {},
+            "lastRowOffset": None,
+            "updatedAt": None,
+        }
+
+    @staticmethod
+    def _apply(progress, row, offset):
+        try:
+            round_index = int(row.get("roundIndex"))
+        except (TypeError, ValueError):
+            round_index = None
+        if round_index is not None:
+            last = progress["lastRoundIndex"]
+            progress["lastRoundIndex"] = round_index if last is None else max(last, round_index)
+            progress["nextRoundIndex"] = progress["lastRoundIndex"] + 1
+        outcome = row.get("outcome") or "unknown"
+        progress["outcomes"][outcome] = progress["outcomes"].get(outcome, 0) + 1
+        progress["rows"] += 1
+        progress["lastRowOffset"] = offset
+        progress["updatedAt"] = time.time()
+
+    def _load(self, participant_id):
+        path = self.index_path(participant_id)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (IOError, ValueError) as e:
+            print("Ignoring unreadable progress index {0}: {1}".format(path, e))
+            return None
+
+    def _save(self, participant_id, progress):
+        # Write to a temporary file and rename it over the index, so a crash
+        # never leaves a half-written index behind
+        path = self.index_path(participant_id)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(progress, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.rename(tmp_path, path)
+
+    def _rebuild(self, participant_id):
+        """Build the index from the CSV, for CSVs without a (matching) index."""
+        path = self.csv_path(participant_id)
+        progress = self._empty(participant_id)
+        with open(path, "rb") as f:
+            # csv.reader joins quoted fields that span lines, so read the lines
+            # ourselves to know the byte offset at which each record starts
+            position = [0]
+
+            def lines():
+                for line in iter(f.readline, b""):
+                    position[0] = f.tell()
+                    yield line if str is bytes else line.decode("utf-8")
+
+            reader = csv.reader(lines())
+            fieldnames = next(reader, None)
+            while fieldnames is not None:
+                offset = position[0]
+                values = next(reader, None)
+                if values is None:
+                    break
+                if values:
+                    self._apply(progress, dict(zip(fieldnames, values)), offset)
+        self._save(participant_id, progress)
+        print("Rebuilt progress index for participant {0} from {1}".format(participant_id, path))
+        return progress
@@ -6,12 +6,13 @@ from __future__ import division, print_function
 
 from morseapi import MorseRobot
 import random
+import threading
 
 # Import local modules
 try:
-    from . import actions, stack
+    from . import actions, colors, stack, transport
 except Exception:
-    import actions, stack
+    import actions, colors, stack, transport
 
 
 class DashRobot:
@@ -27,14 +28,39 @@ class DashRobot:
         robot.rollback()  # Undo last movements
     """
     
-    def __init__(self, bluetooth_address):
+    def __init__(self, bluetooth_address, color_calibration=None, color_gains=(1.0, 1.0, 1.0),
+                 link_rate=20.0, link_burst=10, idle_prepare=True):
         """
         Initialize DashRobot with a Bluetooth address.
         
         :param bluetooth_address: MAC address of the robot (e.g., "D7:A1:50:13:3B:F3")
+        :param color_calibration: Optional dict of color substitutions for this robot
+                                  (default colors.DEFAULT_CALIBRATION)
+        :param color_gains: Per-channel (r, g, b) multipliers for this robot's LEDs
+        :param link_rate: Commands per second the Bluetooth link sustains
+        :param link_burst: Commands that may be sent back to back before rate limiting kicks in
+        :param idle_prepare: If True, move into the opening pose of think() while idle
+                             after each round's celebrate()/feel_sad()
         """
         self.morse_robot = MorseRobot(bluetooth_address)
-        self.movement_stack = stack.DashStack(self.morse_robot)
+        self.color_resolver = colors.ColorResolver(color_calibration, color_gains)
+        # All commands after connect() go through the rate-limited transport,
+        # which also calibrates every light color through color_resolver
+        self.transport = transport.RateLimitedTransport(self.morse_robot, link_rate, link_burst,
+                                                        color_resolver=self.color_resolver)
+        self.movement_stack = stack.DashStack(self.transport)
+
+        # Idle-time preparation state (see prepare_async). Request threads
+        # start and cancel preparations concurrently, so it is guarded by a lock;
+        # each preparation gets its own cancel event.
+        self.idle_prepare = idle_prepare
+        self._prepare_lock = threading.Lock()
+        self._prepared_for = None
+        self._prepare_thread = None
+        self._prepare_cancel = None
+
+        # Set by cancel_think() to cut think() short, cleared by reset_think_cancel()
+        self._think_cancel = threading.Event()
     
     def __enter__(self):
         """Context manager entry."""
@@ -52,20 +78,45 @@ class DashRobot:
         :raises Exception: If connection fails after multiple attempts
         """
         actions.connect(self.morse_robot)
+        self.transport.forget_state()
     
-    def think(self):
+    def think(self, variant="full"):
         """
         Make the robot perform a thinking animation with LED patterns and head movements.
+        
+        :param variant: "full", "short" or "minimal" (see variants.choose_variant)
+        """
+        prepared = self._cancel_prepare() == "think"
+        self.transport.forget_state()
+        actions.think(self.transport, prepared, variant, self._think_cancel)
+
+    def cancel_think(self):
+        """
+        Cut a running think() short. It still returns the robot to its usual
+        end position, so the next action starts from the same place.
+        """
+        self._think_cancel.set()
+
+    def reset_think_cancel(self):
+        """
+        Forget an earlier cancel_think(). Call it before scheduling a new
+        think(), not from inside it, so a cancel that arrives while think()
+        is starting up is not lost.
         """
-        actions.think(self.morse_robot)
+        self._think_cancel.clear()
     
-    def find_answer(self, color):
+    def find_answer(self, color, variant="full", on_reveal=None):
         """
         Make the robot react happily to finding an answer with the specified color.
         
         :param color: Color name (e.g., "red", "green"), hex code, or CSS color (e.g., "#fa3b2c")
+        :param variant: "full", "short" or "minimal" (see variants.choose_variant)
+        :param on_reveal: Optional callable, called once the answer color is showing
         """
-        actions.found_answer(self.morse_robot, color)
+        self.resolve_color(color)  # Fail on an unknown color before any command is sent
+        self._cancel_prepare()
+        self.transport.forget_state()
+        actions.found_answer(self.transport, color, variant, on_reveal)
     
     def move(self, distance_mm, speed_mmps=1000, no_turn=True, track=False):
         """
@@ -77,7 +128,8 @@ class DashRobot:
         :param no_turn: If True, prevent turning when moving backward (default True)
         :param track: If True, add movement to stack for potential rollback
         """
-        actions.move(self.morse_robot, distance_mm, speed_mmps, no_turn,
+        self._cancel_prepare()
+        actions.move(self.transport, distance_mm, speed_mmps, no_turn,
                      self.movement_stack if track else None)
     
     def turn(self, angle, speed=200, track=True):
@@ -89,7 +141,8 @@ class DashRobot:
         :param speed: Rotation speed (degrees per second)
         :param track: If True, add turn to stack for potential rollback (default True)
         """
-        actions.turn(self.morse_robot, angle, speed,
+        self._cancel_prepare()
+        actions.turn(self.transport, angle, speed,
                      self.movement_stack if track else None)
     
     def drive(self, distance):
@@ -98,28 +151,148 @@ class DashRobot:
         
         :param distance: Distance in mm (positive forward, negative backward)
         """
-        self.morse_robot.drive(distance)
+        self._cancel_prepare()
+        self.transport.drive(distance)
     
     def stop(self):
         """Stop all robot movement."""
-        self.morse_robot.stop()
+        self._cancel_prepare()
+        self.transport.stop()
 
     def turn_all_lights(self, color):
         """Set all lights on the robot to the specified color."""
-        actions.turn_all_lights(self.morse_robot, color)
+        self._cancel_prepare()
+        actions.turn_all_lights(self.transport, color)
+
+    def set_frame(self, eye=None, lights=None, head_yaw=None, head_pitch=None,
+                  neck=None, left_ear=None, right_ear=None):
+        """
+        Bring the eye mask, lights and head to a full target state at once.
+        Only fields that differ from what the robot is already showing are sent.
+        Every action starts by forgetting what was sent, so a command dropped
+        by the link is corrected by the next action at the latest.
+        
+        :param eye: Eye LED mask (0 = off, 0b111111111111 = all 12 lit)
+        :param lights: Color for the neck and both ears
+        :param head_yaw: Head yaw angle
+        :param head_pitch: Head pitch angle
+        :param neck: Neck color, overriding `lights`
+        :param left_ear: Left ear color, overriding `lights`
+        :param right_ear: Right ear color, overriding `lights`
+        """
+        self._cancel_prepare()
+        actions.set_frame(self.transport, eye, lights, head_yaw, head_pitch,
+                          neck, left_ear, right_ear)
+
+    def resolve_color(self, color):
+        """
+        Resolve a color to the calibrated "#rrggbb" value this robot should show.
+        Results are cached per robot. The transport resolves every light
+        command this way, so actions can use plain color names.
+        
+        :param color: Color name (e.g., "purple"), hex code (e.g., "#fa3b2c") or (r, g, b) tuple
+        """
+        return self.color_resolver.resolve(color)
     
-    def celebrate(self):
+    def celebrate(self, variant="full"):
         """
         Make the robot celebrate with movements and sounds.
+        
+        :param variant: "full", "short" or "minimal" (see variants.choose_variant)
         """
-        actions.celebrate(self.morse_robot)
+        self._cancel_prepare()
+        self.transport.forget_state()
+        with self.transport.priority(transport.URGENT):
+            actions.celebrate(self.transport, variant)
+        if self.idle_prepare:
+            self.prepare_async("think")
 
-    def feel_sad(self):
+    def feel_sad(self, variant="full"):
         """
         Make the robot express sadness.
+        
+        :param variant: "full", "short" or "minimal" (see variants.choose_variant)
+        """
+        self._cancel_prepare()
+        self.transport.forget_state()
+        with self.transport.priority(transport.URGENT):
+            actions.feel_sad(self.transport, variant)
+        if self.idle_prepare:
+            self.prepare_async("think")
+
+    def prepare(self, action="think", cancelled=None):
+        """
+        Move into the opening pose of an action at low priority, so the action's
+        visible animation starts as soon as it is requested.
+        Stops early if another action is requested in the meantime.
+        
+        :param action: Action to prepare for (a key of actions.OPENING_POSES)
+        :param cancelled: Optional threading.Event that stops the preparation when set
+        """
+        self.transport.forget_state()
+        with self.transport.priority(transport.COSMETIC):
+            reached = actions.prepare(self.transport, action, cancelled)
+        with self._prepare_lock:
+            # A preparation cancelled after its last command does not count
+            if reached and (cancelled is None or not cancelled.is_set()):
+                self._prepared_for = action
+
+    def prepare_async(self, action="think", delay=1.0):
+        """
+        Run prepare() on a background thread after `delay` seconds of idleness.
+        
+        :param action: Action to prepare for (a key of actions.OPENING_POSES)
+        :param delay: Seconds to wait before starting, in case another action follows
         """
-        actions.feel_sad(self.morse_robot)
+        cancelled = threading.Event()
+
+        def _run():
+            # Let the preparation this one replaced send its last command first
+            self._stop_prepare(previous)
+            if not cancelled.wait(delay):
+                self.prepare(action, cancelled)
+
+        thread = threading.Thread(target=_run)
+        thread.daemon = True
+        # Swap in the new preparation and cancel whichever one it replaces, so
+        # two callers racing here cannot leave an uncancelled thread behind.
+        # It starts under the lock, so nobody can try to join it before then.
+        with self._prepare_lock:
+            previous = self._swap_prepare(thread, cancelled)
+            self._prepared_for = None
+            thread.start()
+
+    def _cancel_prepare(self):
+        """
+        Stop any idle preparation in progress before another action runs.
+        
+        :return: The action the robot was fully prepared for, or None
+        """
+        with self._prepare_lock:
+            previous = self._swap_prepare(None, None)
+            prepared, self._prepared_for = self._prepared_for, None
+        self._stop_prepare(previous)
+        return prepared
+
+    def _swap_prepare(self, thread, cancelled):
+        # Caller holds _prepare_lock. Cancelling here, under the lock, stops
+        # the old thread from marking the robot as prepared afterwards.
+        previous = self._prepare_thread
+        if self._prepare_cancel is not None:
+            self._prepare_cancel.set()
+        self._prepare_thread, self._prepare_cancel = thread, cancelled
+        return previous
+
+    @staticmethod
+    def _stop_prepare(thread):
+        # Wait outside the lock: the thread takes it when it finishes
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
 
     def view_movement_history(self):
         """Display the current movement stack."""
         self.movement_stack.view_stack()
+
+    def link_stats(self):
+        """Return how saturated the Bluetooth link is (see RateLimitedTransport.link_stats)."""
+        return self.transport.link_stats()
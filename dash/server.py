@@ -10,19 +10,36 @@ from datetime import datetime
 # Ensure we can import from local modules
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+import progress
+import timing
+import variants
+
 # Mock Robot for development/testing when dependencies are missing
 class MockRobot:
+    def __init__(self, bluetooth_address=None): pass
     def connect(self): print("MOCK: Connected to Dash")
-    def think(self): print("MOCK: Thinking...")
-    def find_answer(self, color): print("MOCK: Found answer")
-    def celebrate(self): print("MOCK: Celebrating!")
-    def feel_sad(self): print("MOCK: Feeling sad :(")
+    def think(self, variant="full"): print("MOCK: Thinking...")
+    def find_answer(self, color, variant="full", on_reveal=None):
+        print("MOCK: Found answer")
+        if on_reveal: on_reveal()
+    def celebrate(self, variant="full"): print("MOCK: Celebrating!")
+    def feel_sad(self, variant="full"): print("MOCK: Feeling sad :(")
+
+# DashRobot pulls in morseapi and the Bluetooth stack, so it is imported lazily
+# by load_robot_class() instead of at module import time.
+DashRobot = None
 
-try:
-    from robot import DashRobot
-except ImportError:
-    print("WARNING: Could not import DashRobot (missing dependencies?). Using MockRobot.")
-    DashRobot = MockRobot
+def load_robot_class():
+    """Import DashRobot on first use, falling back to MockRobot."""
+    global DashRobot
+    if DashRobot is None:
+        try:
+            from robot import DashRobot as robot_class
+        except ImportError:
+            print("WARNING: Could not import DashRobot (missing dependencies?). Using MockRobot.")
+            robot_class = MockRobot
+        DashRobot = robot_class
+    return DashRobot
 
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
@@ -43,42 +60,217 @@ suggest_state = {
 think_lock = threading.Lock()
 think_state = {
     'status': 'idle',   # 'idle' | 'thinking' | 'done'
+    'target_at': None,  # when this round's reveal (start of found_answer()) should land, if requested
+    'deadline_at': None,  # when this round's found_answer() must have finished, if requested
+    'find_variant': None, # found_answer() variant planned by /think
+    'cut_short': False, # set by /suggest when it cancels think() to meet a deadline
     'updated_at': None
 }
 
 BT_ADDRESS = "D7:A1:50:13:3B:F3"
 
+# Longest time /suggest waits for think() to finish
+THINK_WAIT_TIMEOUT = 20
+
+# Seconds a think() cut short takes to stop and reach its end position, plus
+# /suggest's poll interval; think() is cut this much before found_answer() is due
+THINK_CUT_MARGIN = 0.3
+
+# Learned action durations, used to land Dash's reveal at a requested target time
+TIMING_FILE = 'timing.json'
+timing_model = timing.DurationModel(BT_ADDRESS, TIMING_FILE)
+
+# Per-participant progress index, kept next to each <participantId>.csv
+progress_index = progress.ProgressIndex()
+csv_lock = threading.Lock()
+
+def is_json_object(data):
+    """True if a request body is a JSON object, or missing (None)."""
+    return data is None or isinstance(data, dict)
+
+def get_deadline(data, key='deadline'):
+    """Turn an optional time in seconds from now (e.g. 'deadline') in a request body into an absolute time.
+
+    :raises TypeError: If the body is not a JSON object
+    :raises ValueError: If the value is not a number
+    """
+    if not is_json_object(data):
+        raise TypeError("Expected a JSON object")
+    if not data or data.get(key) is None:
+        return None
+    return time.time() + float(data[key])
+
+def remaining(deadline):
+    """Seconds left until an absolute deadline, or None if there is none."""
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+def plan_reveal(budget):
+    """Pick think and found_answer variants that together fit in `budget` seconds.
+
+    A richer found_answer is preferred over a richer think, since the reveal
+    is what participants watch for. No budget means the full variants.
+    """
+    if budget is None:
+        return variants.VARIANTS[0], variants.VARIANTS[0]
+    for find_variant in variants.VARIANTS:
+        for think_variant in variants.VARIANTS:
+            needed = (timing_model.estimate('think', think_variant) +
+                      timing_model.estimate('found_answer', find_variant))
+            if needed <= budget:
+                return think_variant, find_variant
+    return variants.VARIANTS[-1], variants.VARIANTS[-1]
+
+def learn_timing(bot, action, variant, seconds):
+    """Feed a measured duration into timing_model, but only for the real robot.
+
+    MockRobot and the load test's simulated robot finish in (scaled) fake
+    times that would skew the variants picked for real rounds.
+    """
+    if DashRobot is None or DashRobot is MockRobot or not isinstance(bot, DashRobot):
+        return
+    timing_model.observe(action, variant, seconds)
+
+def run_timed(action, variant, fn, *args):
+    """Run a robot action and feed its measured duration into timing_model."""
+    start = time.time()
+    fn(*args)
+    learn_timing(getattr(fn, '__self__', None), action, variant, time.time() - start)
+
+# Track startup progress so /health can report it while the robot initializes
+init_lock = threading.Lock()
+init_state = {
+    'stage': 'starting',   # 'starting' | 'importing' | 'connecting' | 'ready' | 'failed'
+    'error': None,
+    'updated_at': time.time()
+}
+
+def _set_init_stage(stage, error=None):
+    with init_lock:
+        init_state['stage'] = stage
+        init_state['error'] = error
+        init_state['updated_at'] = time.time()
+
 def get_robot():
     global robot
     with robot_lock:
         if robot is None:
             try:
+                _set_init_stage('importing')
+                robot_class = load_robot_class()
                 print("Connecting to Dash...")
-                robot = DashRobot(BT_ADDRESS)
+                _set_init_stage('connecting')
+                robot = robot_class(BT_ADDRESS)
                 robot.connect()
                 print("Dash Connected!")
+                _set_init_stage('ready')
             except Exception as e:
                 print("Failed to connect to Dash:")
                 print(e)
                 robot = None
+                _set_init_stage('failed', str(e))
         return robot
 
+def get_robot_if_ready():
+    """Return the robot without blocking on an initialization in progress.
+
+    Request handlers use this so that a slow Bluetooth connect never stalls
+    HTTP traffic; they answer 503 until it finishes. If no connect is in
+    progress, a new one is started in the background.
+    """
+    if robot is not None:
+        return robot
+    with init_lock:
+        if init_state['stage'] in ('importing', 'connecting'):
+            return None
+        # Not connected and nothing in progress (e.g. the last attempt failed):
+        # retry in the background and answer 503 for now. Claiming the stage
+        # here keeps concurrent requests from starting a second attempt.
+        init_state['stage'] = 'importing'
+        init_state['error'] = None
+        init_state['updated_at'] = time.time()
+    _spawn_init()
+    return None
+
+def _spawn_init():
+    t = threading.Thread(target=get_robot)
+    t.daemon = True
+    t.start()
+    return t
+
+def start_background_init():
+    """Import heavy modules and connect to Dash on a background thread."""
+    # Claim the stage before the thread runs, so requests arriving before it
+    # takes robot_lock see an init in progress instead of starting their own
+    _set_init_stage('importing')
+    return _spawn_init()
+
 @app.route('/health', methods=['GET'])
 def health():
-    return jsonify({"status": "ok", "robot_connected": robot is not None})
+    with init_lock:
+        init = dict(init_state)
+    response = {"status": "ok", "robot_connected": robot is not None, "init": init}
+    if robot is not None and hasattr(robot, 'link_stats'):
+        response['link'] = robot.link_stats()
+    return jsonify(response)
 
 @app.route('/think', methods=['POST'])
 def think():
-    bot = get_robot()
+    data = request.get_json(silent=True)
+    if not is_json_object(data):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        deadline = get_deadline(data)
+        # Moment Dash's found_answer() should finish, for /suggest to aim at
+        target_at = get_deadline(data, 'target')
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid deadline"}), 400
+
+    bot = get_robot_if_ready()
     if bot:
+        start_delay = 0
+        if target_at is not None:
+            # Dash shows the color in the first commands of found_answer(), so
+            # the reveal is its start: think() is planned to end at the target
+            variant = variants.choose_variant('think', remaining(target_at),
+                                              timing_model.durations('think'))
+            start_delay = max(0, remaining(target_at) - timing_model.estimate('think', variant))
+            find_variant = variants.choose_variant(
+                'found_answer', None if deadline is None else deadline - target_at,
+                timing_model.durations('found_answer'))
+        else:
+            variant, find_variant = plan_reveal(remaining(deadline))
+        # Clear last round's cancel before the think thread exists, so a cancel
+        # from this round's /suggest cannot be wiped out by it
+        if hasattr(bot, 'reset_think_cancel'):
+            bot.reset_think_cancel()
         # Mark think as pending
         with think_lock:
             think_state['status'] = 'thinking'
+            think_state['target_at'] = target_at
+            think_state['deadline_at'] = deadline
+            think_state['find_variant'] = find_variant
+            think_state['cut_short'] = False
             think_state['updated_at'] = time.time()
+
+        def _was_cut_short():
+            with think_lock:
+                return think_state['cut_short']
         
         def _do_think():
             try:
-                bot.think()
+                start_at = time.time() + start_delay
+                while time.time() < start_at and not _was_cut_short():
+                    time.sleep(0.1)
+                if _was_cut_short():
+                    print('[think] Cut short before it started, skipping')
+                    return
+                start = time.time()
+                bot.think(variant)
+                # A think() cut short says nothing about how long the variant takes
+                if not _was_cut_short():
+                    learn_timing(bot, 'think', variant, time.time() - start)
             except Exception as e:
                 print('Error during bot.think:')
                 print(e)
@@ -89,18 +281,48 @@ def think():
         
         # Run in thread to not block response
         threading.Thread(target=_do_think).start()
-        return jsonify({"status": "thinking"})
+        # Seconds until Dash reveals the color, so the client can tell when
+        # participants have seen Dash's feedback
+        reveal_in = None if target_at is None else round(max(0, remaining(target_at)), 3)
+        return jsonify({"status": "thinking", "variant": variant,
+                        "start_delay": round(start_delay, 3), "reveal_in": reveal_in})
     return jsonify({"error": "Robot not connected"}), 503
 
 @app.route('/suggest', methods=['POST'])
 def suggest():
     data = request.json
+    if not data or not is_json_object(data):
+        return jsonify({"error": "Expected a JSON object"}), 400
     color = data.get('color')
     if not color:
         return jsonify({"error": "Missing color"}), 400
+    try:
+        deadline = get_deadline(data)
+        target_at = get_deadline(data, 'target')
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid deadline"}), 400
     
-    bot = get_robot()
+    bot = get_robot_if_ready()
     if bot:
+        # Fall back to what this round's /think planned for
+        with think_lock:
+            planned = dict(think_state)
+        if target_at is None:
+            target_at = planned['target_at']
+        if deadline is None:
+            deadline = planned['deadline_at']
+        find_variant = planned['find_variant'] or variants.choose_variant(
+            'found_answer', remaining(deadline), timing_model.durations('found_answer'))
+        # Latest moment found_answer() may start: the target itself, or early
+        # enough for the variant /think planned to finish before the deadline.
+        # Cutting think() short there keeps a richer found_answer(), as
+        # plan_reveal() prefers, instead of downgrading the reveal.
+        if target_at is not None:
+            reveal_by = target_at
+        elif deadline is not None:
+            reveal_by = deadline - timing_model.estimate('found_answer', find_variant)
+        else:
+            reveal_by = None
         # CRITICAL: Mark as pending but DON'T start find_answer yet
         # We will wait for think() to complete first
         with suggest_lock:
@@ -109,24 +331,55 @@ def suggest():
             suggest_state['updated_at'] = time.time()
 
         def _wait_for_think_then_find(c):
-            # STEP 1: Wait for think() to complete (max 20 seconds)
+            # STEP 1: Wait for think() to complete (max 20 seconds). Once
+            # found_answer() is due to start, cut think() short rather than
+            # running both animations at once or revealing late.
             print('[suggest] Waiting for think() to complete...')
             start_wait = time.time()
+            cut_short = False
+            timed_out = False
             while True:
                 with think_lock:
                     if think_state['status'] == 'done':
                         print('[suggest] think() is done, proceeding to find_answer()')
                         break
+
+                if (not cut_short and reveal_by is not None and
+                        remaining(reveal_by) <= THINK_CUT_MARGIN):
+                    print('[suggest] Reveal due, cutting think() short')
+                    with think_lock:
+                        think_state['cut_short'] = True
+                    if hasattr(bot, 'cancel_think'):
+                        bot.cancel_think()
+                    cut_short = True
                 
-                if time.time() - start_wait > 20:
+                if time.time() - start_wait > THINK_WAIT_TIMEOUT:
                     print('[suggest] Timeout waiting for think(), proceeding anyway')
+                    timed_out = True
                     break
                 
                 time.sleep(0.1)  # Poll every 100ms
             
-            # STEP 2: Now call find_answer() only after think() is complete
+            # STEP 2: Now call find_answer() only after think() is complete.
+            # It reveals the color right away, so hold it back to the target.
+            if target_at is not None:
+                delay = remaining(target_at)
+                if delay > 0:
+                    time.sleep(delay)
+            if cut_short and not timed_out:
+                # think() was cut short so that the planned variant still fits
+                variant = find_variant
+            elif deadline is not None:
+                # Richest variant that still finishes before the deadline
+                variant = variants.choose_variant('found_answer', remaining(deadline),
+                                                  timing_model.durations('found_answer'))
+            else:
+                variant = find_variant
+            print('[suggest] Running find_answer({0}) variant: {1}'.format(c, variant))
+            revealed = []
             try:
-                bot.find_answer(c)
+                run_timed('found_answer', variant, bot.find_answer, c, variant,
+                          lambda: revealed.append(time.time()))
             except Exception as e:
                 print('Error during bot.find_answer:')
                 print(e)
@@ -136,6 +389,11 @@ def suggest():
                     suggest_state['color'] = c
                     suggest_state['updated_at'] = time.time()
                 print('[suggest] find_answer({0}) complete'.format(c))
+                if target_at is not None and revealed:
+                    # Measured from when the color appeared, not when the call returned
+                    error = revealed[0] - target_at
+                    timing_model.record_error(error)
+                    print('[timing] Reveal landed {0:+.3f}s from target'.format(error))
 
         threading.Thread(target=_wait_for_think_then_find, args=(color,)).start()
         return jsonify({"status": "suggesting", "color": color})
@@ -172,20 +430,47 @@ def suggest_status():
         'suggest': suggest
     })
 
+@app.route('/timing', methods=['GET'])
+def timing_stats():
+    """Return learned action durations and how far recent reveals were from their target."""
+    return jsonify(timing_model.stats())
+
 @app.route('/celebrate', methods=['POST'])
 def celebrate():
-    bot = get_robot()
+    data = request.get_json(silent=True)
+    if not is_json_object(data):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        deadline = get_deadline(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid deadline"}), 400
+
+    bot = get_robot_if_ready()
     if bot:
-        threading.Thread(target=bot.celebrate).start()
-        return jsonify({"status": "celebrating"})
+        variant = variants.choose_variant('celebrate', remaining(deadline),
+                                          timing_model.durations('celebrate'))
+        threading.Thread(target=run_timed,
+                         args=('celebrate', variant, bot.celebrate, variant)).start()
+        return jsonify({"status": "celebrating", "variant": variant})
     return jsonify({"error": "Robot not connected"}), 503
 
 @app.route('/sad', methods=['POST'])
 def sad():
-    bot = get_robot()
+    data = request.get_json(silent=True)
+    if not is_json_object(data):
+        return jsonify({"error": "Expected a JSON object"}), 400
+    try:
+        deadline = get_deadline(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "Invalid deadline"}), 400
+
+    bot = get_robot_if_ready()
     if bot:
-        threading.Thread(target=bot.feel_sad).start()
-        return jsonify({"status": "sad"})
+        variant = variants.choose_variant('feel_sad', remaining(deadline),
+                                          timing_model.durations('feel_sad'))
+        threading.Thread(target=run_timed,
+                         args=('feel_sad', variant, bot.feel_sad, variant)).start()
+        return jsonify({"status": "sad", "variant": variant})
     return jsonify({"error": "Robot not connected"}), 503
 
 @app.route('/csv', methods=['POST'])
@@ -198,7 +483,6 @@ def save_csv():
     try:
         participant_id = data.get('participantId', 'unknown')
         csv_file = '{0}.csv'.format(participant_id)
-        file_exists = os.path.isfile(csv_file)
         
         # Define CSV columns
         fieldnames = [
@@ -212,16 +496,24 @@ def save_csv():
             data['timestamp'] = datetime.now().isoformat()
         
         # Python 2 compatible file opening (no newline or encoding parameters)
-        with open(csv_file, 'ab') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            
-            # Write header if file is new
+        with csv_lock:
+            file_exists = os.path.isfile(csv_file)
+            with open(csv_file, 'ab') as f:
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                
+                # Write header if file is new
+                if not file_exists:
+                    writer.writeheader()
+                
+                # Write the data row, remembering where it starts for the index
+                row = {k: data.get(k, '') for k in fieldnames}
+                f.seek(0, os.SEEK_END)
+                offset = f.tell()
+                writer.writerow(row)
             if not file_exists:
-                writer.writeheader()
-            
-            # Write the data row
-            row = {k: data.get(k, '') for k in fieldnames}
-            writer.writerow(row)
+                # New CSV: don't carry over progress from an earlier one
+                progress_index.reset(participant_id)
+            progress_index.record(participant_id, row, offset)
         
         print("CSV data saved to {0}".format(csv_file))
         return jsonify({"status": "saved", "file": csv_file}), 200
@@ -230,8 +522,31 @@ def save_csv():
         print("Error saving CSV: {0}".format(str(e)))
         return jsonify({"error": str(e)}), 500
 
+@app.route('/resume/<participant_id>', methods=['GET'])
+def resume(participant_id):
+    """Return where a participant's session should resume, from their progress index."""
+    try:
+        state = progress_index.get(participant_id)
+    except Exception as e:
+        print("Error reading progress for {0}: {1}".format(participant_id, str(e)))
+        return jsonify({"error": str(e)}), 500
+    if state is None:
+        return jsonify({"participantId": participant_id, "found": False, "nextRoundIndex": 0})
+    state['found'] = True
+    return jsonify(state)
+
 if __name__ == '__main__':
-    # Attempt initial connection
-    get_robot()
+    import argparse
+    parser = argparse.ArgumentParser(description='Dash robot server.')
+    parser.add_argument('--connect-first', action='store_true',
+                        help='Connect to Dash before binding the HTTP port (old behaviour)')
+    args = parser.parse_args()
+
+    if args.connect_first:
+        # Attempt initial connection
+        get_robot()
+    else:
+        # Serve immediately; /health reports the init stage until Dash is ready
+        start_background_init()
     print("Starting Flask server on port 5000...")
     app.run(host='0.0.0.0', port=5000)
@@ -0,0 +1,113 @@
+"""
+Closed-loop timing for Dash's actions.
+
+DurationModel learns how long each action variant actually takes on a given
+robot (an exponential moving average, seeded from variants.ACTION_DURATIONS),
+so the server can schedule think() and found_answer() to land Dash's reveal at a
+requested moment, and records how far off each round was.
+"""
+from __future__ import division, print_function
+
+import json
+import os
+import threading
+from collections import deque
+
+import variants
+
+
+class DurationModel:
+    """
+    Per-robot moving average of action durations, persisted to a JSON file.
+
+    Usage:
+        model = DurationModel("D7:A1:50:13:3B:F3", "timing.json")
+        model.estimate("think", "full")         # 8.0 until something is observed
+        model.observe("think", "full", 8.6)     # after timing a real run
+        model.record_error(0.12)                # reveal landed 120 ms late
+    """
+
+    def __init__(self, robot_id, path=None, alpha=0.3, history=50):
+        """
+        :param robot_id: Key the learned durations are stored under (e.g. Bluetooth address)
+        :param path: JSON file to load/save learned durations, or None to keep them in memory
+        :param alpha: Weight of the newest observation in the moving average
+        :param history: Number of recent timing errors kept for stats()
+        """
+        self.robot_id = robot_id
+        self.path = path
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._durations = {}
+        self._errors = deque(maxlen=history)
+        self._load()
+
+    def _load(self):
+        if not self.path or not os.path.isfile(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                self._durations = json.load(f).get(self.robot_id, {})
+        except (IOError, ValueError) as e:
+            print("Could not load timing history from {0}: {1}".format(self.path, e))
+
+    def _save(self):
+        if not self.path:
+            return
+        data = {}
+        if os.path.isfile(self.path):
+            try:
+                with open(self.path) as f:
+                    data = json.load(f)
+            except (IOError, ValueError):
+                data = {}
+        data[self.robot_id] = self._durations
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2, sort_keys=True)
+        os.rename(tmp_path, self.path)
+
+    def estimate(self, action, variant="full"):
+        """Expected duration (seconds) of a variant, learned or from variants.ACTION_DURATIONS."""
+        with self._lock:
+            learned = self._durations.get(action, {}).get(variant)
+        if learned is None:
+            return variants.duration(action, variant)
+        return learned
+
+    def durations(self, action):
+        """Expected duration of every variant of an action, for variants.choose_variant."""
+        return dict((v, self.estimate(action, v)) for v in variants.VARIANTS)
+
+    def observe(self, action, variant, seconds):
+        """Fold a measured duration into the moving average and persist it."""
+        with self._lock:
+            per_action = self._durations.setdefault(action, {})
+            previous = per_action.get(variant)
+            if previous is None:
+                per_action[variant] = seconds
+            else:
+                per_action[variant] = (1 - self.alpha) * previous + self.alpha * seconds
+            try:
+                self._save()
+            except (IOError, OSError) as e:
+                print("Could not save timing history to {0}: {1}".format(self.path, e))
+
+    def record_error(self, seconds):
+        """Record how far (seconds, positive = late) a reveal landed from its target."""
+        with self._lock:
+            self._errors.append(seconds)
+
+    def stats(self):
+        """Learned durations and the mean/max absolute error of recent rounds."""
+        with self._lock:
+            errors = list(self._errors)
+            durations = dict((a, dict(v)) for a, v in self._durations.items())
+        abs_errors = [abs(e) for e in errors]
+        return {
+            "robot": self.robot_id,
+            "durations": durations,
+            "recent_errors": [round(e, 3) for e in errors],
+            "mean_abs_error": round(sum(abs_errors) / len(abs_errors), 3) if errors else None,
+            "max_abs_error": round(max(abs_errors), 3) if errors else None,
+        }
@@ -0,0 +1,296 @@
+"""
+RateLimitedTransport: a token-bucket wrapper around MorseRobot.
+
+Every command sent to the robot consumes a token. Tokens refill at the link's
+rate, so overlapping request threads cannot flood the Bluetooth link; callers
+block (backpressure) until their command may be sent. Urgent commands go
+ahead of everything else, cosmetic ones yield to anything more important, and
+only stop/reset bypass the bucket entirely.
+"""
+from __future__ import division, print_function
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# Command priorities (lower value = more important)
+URGENT = 0     # stop, outcome reactions
+NORMAL = 1     # motion and sound
+COSMETIC = 2   # lights
+
+# Default priority of each MorseRobot command; anything else is NORMAL
+COMMAND_PRIORITIES = {
+    "stop": URGENT,
+    "reset": URGENT,
+    "eye": COSMETIC,
+    "eye_brightness": COSMETIC,
+    "neck_color": COSMETIC,
+    "left_ear_color": COSMETIC,
+    "right_ear_color": COSMETIC,
+}
+
+# Commands that are not sent over the link and so are never rate limited
+UNLIMITED_COMMANDS = ("connect", "disconnect")
+
+# Commands that must reach the robot right away, even if that overdraws the bucket
+NEVER_WAIT_COMMANDS = ("stop", "reset")
+
+# Actuator commands whose last sent value is remembered, in the order
+# set_frame() sends them
+FRAME_COMMANDS = (
+    "eye",
+    "neck_color",
+    "left_ear_color",
+    "right_ear_color",
+    "head_yaw",
+    "head_pitch",
+)
+
+# Seconds over which link_stats() measures the throughput the robot accepted
+THROUGHPUT_WINDOW = 5.0
+
+# Commands that take a color, resolved through the robot's ColorResolver
+COLOR_COMMANDS = ("neck_color", "left_ear_color", "right_ear_color")
+
+# Commands after which the robot's actuator state is unknown
+STATE_RESET_COMMANDS = ("connect", "reset")
+
+
+class RateLimitedTransport:
+    """
+    Wraps a MorseRobot so that its commands go through a token bucket.
+
+    Usage:
+        transport = RateLimitedTransport(morse_robot, rate=20, burst=10)
+        transport.eye(0)                  # waits for a token if the link is busy
+        with transport.priority(URGENT):
+            actions.celebrate(transport)  # outcome reaction goes ahead of others
+        transport.link_stats()            # how saturated the link is
+        transport.set_frame(eye=0, neck_color="black", head_yaw=-15)
+    """
+
+    def __init__(self, robot, rate=20.0, burst=10, cosmetic_reserve=2, color_resolver=None):
+        """
+        :param robot: The MorseRobot instance commands are forwarded to
+        :param rate: Commands per second the link sustains (tokens refilled per second)
+        :param burst: Bucket capacity, i.e. commands that may be sent back to back
+        :param cosmetic_reserve: Tokens cosmetic commands leave for more important ones
+                                 (capped at burst - 1 so cosmetic commands can still run)
+        :param color_resolver: Optional colors.ColorResolver; every color sent with
+                               COLOR_COMMANDS is calibrated through it
+        :raises ValueError: If rate is not positive or burst is below 1
+        """
+        if rate <= 0:
+            raise ValueError("rate must be positive, got {0!r}".format(rate))
+        if burst < 1:
+            raise ValueError("burst must be at least 1, got {0!r}".format(burst))
+        self.robot = robot
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.cosmetic_reserve = max(0, min(cosmetic_reserve, self.burst - 1))
+        self.color_resolver = color_resolver
+
+        self._cond = threading.Condition(threading.Lock())
+        self._tokens = self.burst
+        self._last_refill = time.time()
+        self._waiting = {URGENT: 0, NORMAL: 0, COSMETIC: 0}
+        self._local = threading.local()
+
+        # Last value sent for each of FRAME_COMMANDS
+        self._state_lock = threading.Lock()
+        self._state = {}
+
+        # Statistics
+        self._created = time.time()
+        self._sent = 0
+        self._total_wait = 0.0
+        self._send_time_avg = None
+        self._recent_sends = deque()  # completion times within THROUGHPUT_WINDOW
+
+    # --- Token bucket -------------------------------------------------------
+
+    def _refill(self):
+        now = time.time()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    def _can_send(self, priority):
+        if any(self._waiting[p] for p in self._waiting if p < priority):
+            return False
+        needed = 1 + (self.cosmetic_reserve if priority == COSMETIC else 0)
+        return self._tokens >= needed
+
+    def acquire(self, priority=NORMAL, never_wait=False):
+        """
+        Block until a command of the given priority may be sent, then take a token.
+        
+        :param priority: URGENT, NORMAL or COSMETIC; waiters of a more important
+                         priority are always served first
+        :param never_wait: Take the token right away, even if that overdraws
+                           the bucket (used for NEVER_WAIT_COMMANDS)
+        """
+        start = time.time()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                self._refill()
+                while not never_wait and not self._can_send(priority):
+                    deficit = max(1 - self._tokens, 0) / self.rate
+                    self._cond.wait(max(deficit, 0.01))
+                    self._refill()
+                self._tokens -= 1
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+            self._sent += 1
+            self._total_wait += time.time() - start
+
+    @contextmanager
+    def priority(self, priority):
+        """
+        Send every command issued by this thread inside the block at `priority`.
+        Commands that are URGENT by default (e.g. stop) stay urgent. Commands
+        still take tokens, so even an urgent block is rate limited.
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield self
+        finally:
+            self._local.priority = previous
+
+    def _priority_for(self, name):
+        default = COMMAND_PRIORITIES.get(name, NORMAL)
+        override = getattr(self._local, "priority", None)
+        if override is None or default == URGENT:
+            return default
+        return override
+
+    # --- Forwarding ---------------------------------------------------------
+
+    def __getattr__(self, name):
+        attr = getattr(self.robot, name)
+        if not callable(attr) or name.startswith("_"):
+            return attr
+        if name in UNLIMITED_COMMANDS:
+            if name in STATE_RESET_COMMANDS:
+                return self._forgetting_state(attr)
+            return attr
+
+        def send(*args, **kwargs):
+            if args:
+                args = (self._resolve(name, args[0]),) + args[1:]
+            self.acquire(self._priority_for(name), name in NEVER_WAIT_COMMANDS)
+            start = time.time()
+            try:
+                result = attr(*args, **kwargs)
+            except Exception:
+                self._forget(name)
+                raise
+            finally:
+                self._record_send(start)
+            self._remember(name, args, kwargs)
+            return result
+        return send
+
+    def set_frame(self, **frame):
+        """
+        Bring several actuators to a target state in as few commands as possible.
+
+        Keyword arguments are FRAME_COMMANDS names (eye, neck_color,
+        left_ear_color, right_ear_color, head_yaw, head_pitch). Fields that are
+        None, or already at the requested value, are not sent at all.
+
+        :return: Number of commands actually sent
+        """
+        unknown = set(frame) - set(FRAME_COMMANDS)
+        if unknown:
+            raise ValueError("Unknown frame fields: {0}".format(", ".join(sorted(unknown))))
+        # Resolve colors up front, so a bad one fails before anything is sent;
+        # the remembered state holds resolved values
+        resolved = dict((name, self._resolve(name, value)) for name, value in frame.items())
+        sent = 0
+        for name in FRAME_COMMANDS:
+            value = frame.get(name)
+            if value is None:
+                continue
+            with self._state_lock:
+                if self._state.get(name) == resolved[name]:
+                    continue
+            getattr(self, name)(value)
+            sent += 1
+        return sent
+
+    def _resolve(self, name, value):
+        if self.color_resolver is None or name not in COLOR_COMMANDS or value is None:
+            return value
+        return self.color_resolver.resolve(value)
+
+    def forget_state(self):
+        """
+        Forget every remembered actuator value, so the next frame resends everything.
+        DashRobot calls this at the start of each action, so a command the link
+        dropped does not stay wrong for longer than one action.
+        """
+        with self._state_lock:
+            self._state.clear()
+
+    def _remember(self, name, args, kwargs):
+        if name in FRAME_COMMANDS and len(args) == 1 and not kwargs:
+            with self._state_lock:
+                self._state[name] = args[0]
+        elif name in STATE_RESET_COMMANDS:
+            self.forget_state()
+
+    def _forget(self, name):
+        with self._state_lock:
+            self._state.pop(name, None)
+
+    def _forgetting_state(self, attr):
+        def call(*args, **kwargs):
+            self.forget_state()
+            return attr(*args, **kwargs)
+        return call
+
+    def _record_send(self, start):
+        now = time.time()
+        elapsed = now - start
+        with self._cond:
+            if self._send_time_avg is None:
+                self._send_time_avg = elapsed
+            else:
+                self._send_time_avg = 0.9 * self._send_time_avg + 0.1 * elapsed
+            self._recent_sends.append(now)
+            self._prune_sends(now)
+
+    def _prune_sends(self, now):
+        while self._recent_sends and self._recent_sends[0] < now - THROUGHPUT_WINDOW:
+            self._recent_sends.popleft()
+
+    def link_stats(self):
+        """
+        Report how saturated the link is.
+
+        saturation is the fraction of the bucket currently in use (1.0 = every
+        new command has to wait); throughput is the commands per second the
+        robot accepted over the last THROUGHPUT_WINDOW seconds, which only
+        approaches the link's capacity while the link is saturated;
+        avg_send_ms is how long a single command call takes, not a capacity.
+        """
+        with self._cond:
+            self._refill()
+            now = time.time()
+            self._prune_sends(now)
+            window = min(THROUGHPUT_WINDOW, now - self._created)
+            return {
+                "rate": self.rate,
+                "burst": self.burst,
+                "tokens": round(self._tokens, 2),
+                "saturation": round(min(1.0, max(0.0, 1 - self._tokens / self.burst)), 3),
+                "waiting": sum(self._waiting.values()),
+                "sent": self._sent,
+                "avg_wait_ms": round(self._total_wait / self._sent * 1000, 2) if self._sent else 0.0,
+                "throughput": round(len(self._recent_sends) / window, 1) if window > 0 else 0.0,
+                "avg_send_ms": round(self._send_time_avg * 1000, 3) if self._send_time_avg is not None else None,
+            }
@@ -0,0 +1,47 @@
+"""
+Time-budgeted animation variants.
+
+Every robot action comes in a "full", "short" and "minimal" variant with a known
+duration, so callers with a deadline can pick the richest one that still fits.
+This module has no robot dependencies so the server can use it before Dash is
+connected.
+"""
+from __future__ import division, print_function
+
+# Variants from richest to cheapest
+VARIANTS = ("full", "short", "minimal")
+
+# Estimated duration (seconds) of each variant: the sleeps in actions.py plus an
+# allowance for moves and turns. Not measured on the robot; timing.DurationModel
+# replaces them with measured averages once the real robot has run each variant.
+ACTION_DURATIONS = {
+    "think": {"full": 8.0, "short": 3.0, "minimal": 1.0},
+    "found_answer": {"full": 3.5, "short": 2.2, "minimal": 1.4},
+    "celebrate": {"full": 5.0, "short": 2.5, "minimal": 1.4},
+    "feel_sad": {"full": 4.5, "short": 2.4, "minimal": 1.4},
+}
+
+
+def choose_variant(action, budget=None, durations=None):
+    """
+    Return the richest variant of `action` that finishes within `budget` seconds.
+
+    :param action: Action name (a key of ACTION_DURATIONS)
+    :param budget: Seconds available, or None for no deadline
+    :param durations: Optional {variant: seconds} overriding ACTION_DURATIONS,
+                      e.g. learned by timing.DurationModel
+    :return: "full" if there is no deadline, "minimal" if nothing fits
+    """
+    if budget is None:
+        return VARIANTS[0]
+    if durations is None:
+        durations = ACTION_DURATIONS[action]
+    for variant in VARIANTS:
+        if durations[variant] <= budget:
+            return variant
+    return VARIANTS[-1]
+
+
+def duration(action, variant="full"):
+    """Expected duration (seconds) of a variant of an action."""
+    return ACTION_DURATIONS[action][variant]
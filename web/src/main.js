@@ -14,6 +14,10 @@ import { i18n } from './i18n.js'
 // Dash Server URL
 const DASH_SERVER = 'http://localhost:5000';
 
+// When the LLM message appears; the Dash server schedules think() + found_answer()
+// so that Dash's reveal lands at the same moment
+const LLM_MESSAGE_DELAY_MS = 12000;
+
 function callDash(endpoint, body = {}) {
   return fetch(`${DASH_SERVER}/${endpoint}`, {
     method: 'POST',
@@ -348,11 +352,32 @@ function loadModel() {
 
     scene.add(bombModel);
 
-    // START GAME
-    startRound(0);
+    // START GAME (from the saved round when resuming a crashed session)
+    getResumeRound().then(startRound);
   });
 }
 
+/**
+ * With ?resume=1, ask the Dash server which round this participant reached.
+ * Resolves to 0 when not resuming or when the server has no progress saved.
+ */
+function getResumeRound() {
+  const participantId = localStorage.getItem('participantId');
+  if (urlParams.get('resume') !== '1' || !participantId) return Promise.resolve(0);
+
+  return fetch(`${DASH_SERVER}/resume/${encodeURIComponent(participantId)}`)
+    .then(r => r.json())
+    .then(state => {
+      const next = state && state.found ? state.nextRoundIndex : 0;
+      console.log(`[Resume] Participant ${participantId} resumes at round index ${next}`);
+      return Math.min(next, allRounds.length);
+    })
+    .catch(err => {
+      console.warn('Could not fetch resume state:', err);
+      return 0;
+    });
+}
+
 function startRound(index) {
   if (index >= allRounds.length) {
     window.location.href = '/thanks.html';
@@ -505,31 +530,41 @@ function startRound(index) {
     llmContainer.addMessage(msg, "LLM");
     playSound('message', { volume: 0.5 });
     hasReceivedFeedback = true;
-  }, 12000);
-
-  // Dash Logic
-  callDash('think');
-
-  // Schedule Dash Suggestion (slightly delayed from LLM or same time)
-  setTimeout(() => {
-    if (!isRoundActive) return;
-
-    // Map logical suggestion to physical cable for Dash (who points/moves)
-    const dashLogicalSuggestion = roundData.dashSuggestion;
-    const dashPhysicalSuggestion = currentCableMapping[dashLogicalSuggestion];
-
-    // Get color for Dash
-    if (dashPhysicalSuggestion) {
-      const dashCableNum = parseInt(dashPhysicalSuggestion.replace('cable', ''));
-      const dashColor = currentColorMapping[dashCableNum];
+  }, LLM_MESSAGE_DELAY_MS);
+
+  // Dash Logic: the server times think() + found_answer() so the reveal lands
+  // together with the LLM message, and logs how far off it was
+  const thinkRequest = callDash('think', { target: LLM_MESSAGE_DELAY_MS / 1000 })
+    .then(res => (res && res.ok ? res.json() : null))
+    .catch(() => null);
+  const dashRoundIndex = currentRoundIndex;
+
+  // Map logical suggestion to physical cable for Dash (who points/moves)
+  const dashLogicalSuggestion = roundData.dashSuggestion;
+  const dashPhysicalSuggestion = currentCableMapping[dashLogicalSuggestion];
+  let dashColor = null;
+  if (dashPhysicalSuggestion) {
+    const dashCableNum = parseInt(dashPhysicalSuggestion.replace('cable', ''));
+    dashColor = currentColorMapping[dashCableNum];
+  }
 
+  // Send the color as soon as think() is registered so the server can start
+  // found_answer() on schedule; it still waits for think() and holds the
+  // reveal until the target
+  if (dashColor) {
+    thinkRequest.then(plan => {
+      if (!isRoundActive || currentRoundIndex !== dashRoundIndex) return;
       console.log(`Dash Suggests: ${dashLogicalSuggestion} -> ${dashPhysicalSuggestion} (${dashColor})`);
-      if (dashColor) {
-        callDash('suggest', { color: dashColor });
+      callDash('suggest', { color: dashColor });
+
+      // Dash counts as feedback from the moment the server scheduled its reveal
+      if (!plan || plan.reveal_in == null) return;
+      setTimeout(() => {
+        if (!isRoundActive || currentRoundIndex !== dashRoundIndex) return;
         hasReceivedFeedback = true;
-      }
-    }
-  }, 10000); // 10 seconds in
+      }, plan.reveal_in * 1000);
+    });
+  }
 }
 
 function showResultOverlay(result, roundIdx, cutCableName = null, wasCutBeforeFeedback = false) {